@@ -1,6 +1,6 @@
 import typer
 from src.utils import (
-    fetch_and_parse_data,
+    fetch_and_parse_rows,
     save_output,
     get_missing_dates,
     fetch_station_data,
@@ -9,16 +9,22 @@ from src.utils import (
 from src.db.sqlite import (
     get_weather_data,
     init_database,
-    get_all_weather_data,
+    insert_weather_data,
+    iter_all_weather_data,
     get_station_list,
     insert_station_details,
     get_missing_stations,
     get_all_station_details,
 )
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from queue import Empty, Queue
+import logging
 import os
+import threading
 
 
 app = typer.Typer()
@@ -36,6 +42,9 @@ def summary(
         None, "--to", help="Optional end date in YYYY-MM-DD format"
     ),
     save: bool = typer.Option(False, "--save", help="Save output to file"),
+    workers: int = typer.Option(
+        10, "--workers", help="Number of concurrent fetch workers"
+    ),
 ):
     init_database()
 
@@ -43,54 +52,112 @@ def summary(
 
     print(f"Found {len(missing_dates)} missing dates")
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(fetch_and_parse_data, date) for date in missing_dates
-        ]
-
-        with typer.progressbar(
-            as_completed(futures), length=len(futures), label="Fetching weather data"
-        ) as progress:
-            for future in progress:
-                future.result()
+    # Fetch/parse workers push row batches onto a bounded queue; a single
+    # writer thread drains it so all SQLite writes serialize through one
+    # connection instead of ten threads contending for the write lock
+    batch_queue: Queue = Queue(maxsize=32)
+
+    def write_batches():
+        # Coalesce whatever the fetch workers have queued up so a burst of
+        # completed dates lands in one transaction instead of one commit
+        # per date; 5000 rows caps how much sits in memory per flush
+        pending: list = []
+        while True:
+            batch = batch_queue.get()
+            if batch is not None:
+                pending.extend(batch)
+            while batch is not None and len(pending) < 5000:
+                try:
+                    batch = batch_queue.get_nowait()
+                except Empty:
+                    break
+                if batch is not None:
+                    pending.extend(batch)
+            if pending:
+                try:
+                    insert_weather_data(pending)
+                except Exception as e:
+                    typer.secho(
+                        f"Error inserting batch weather data: {e}", fg=typer.colors.RED
+                    )
+                pending = []
+            if batch is None:
+                break
+
+    def fetch_worker(date):
+        batch = fetch_and_parse_rows(date)
+        if batch:
+            batch_queue.put(batch)
+
+    writer = threading.Thread(target=write_batches)
+    writer.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetch_worker, date) for date in missing_dates]
+
+            with typer.progressbar(
+                as_completed(futures),
+                length=len(futures),
+                label="Fetching weather data",
+            ) as progress:
+                for future in progress:
+                    future.result()
+    finally:
+        batch_queue.put(None)
+        writer.join()
+
+
+# Arrow schema matching the SQLite weather_data table, used by `dump`
+WEATHER_SCHEMA = pa.schema(
+    [
+        ("date", pa.string()),
+        ("time", pa.string()),
+        ("station_id", pa.string()),
+        ("station_name", pa.string()),
+        ("temp_max", pa.float64()),
+        ("temp_min", pa.float64()),
+        ("temp_med", pa.float64()),
+        ("wind_dir", pa.string()),
+        ("wind_speed", pa.float64()),
+        ("wind_gust", pa.float64()),
+        ("pressure", pa.float64()),
+        ("precipitation", pa.float64()),
+        ("total_cloud", pa.float64()),
+        ("low_cloud", pa.float64()),
+        ("sun_duration", pa.float64()),
+        ("visibility", pa.float64()),
+        ("humidity", pa.float64()),
+        ("dew_point", pa.float64()),
+        ("weather_summary", pa.string()),
+        ("snow_depth", pa.int64()),
+        ("_updated_at", pa.string()),
+    ]
+)
 
 
 @app.command()
 def dump():
     print("Dumping data to parquet")
-    # Define column names based on the SQLite schema
-    columns = [
-        "date",
-        "time",
-        "station_id",
-        "station_name",
-        "temp_max",
-        "temp_min",
-        "temp_med",
-        "wind_dir",
-        "wind_speed",
-        "wind_gust",
-        "pressure",
-        "precipitation",
-        "total_cloud",
-        "low_cloud",
-        "sun_duration",
-        "visibility",
-        "humidity",
-        "dew_point",
-        "weather_summary",
-        "snow_depth",
-        "_updated_at",
-    ]
-
-    # Create DataFrame with column names
-    df = pd.DataFrame(get_all_weather_data(), columns=columns)
-    print(f"Found {len(df)} rows")
+    columns = WEATHER_SCHEMA.names
 
     today = datetime.now().strftime("%Y-%m-%d")
     os.makedirs("output/dump", exist_ok=True)
-    df.to_parquet(f"output/dump/{today}.parquet")
-    print(f"Data dumped to output/dump/{today}.parquet")
+    output_path = f"output/dump/{today}.parquet"
+
+    # Stream chunks from SQLite straight into the Parquet writer so only
+    # one chunk of rows is ever resident in memory
+    total_rows = 0
+    with pq.ParquetWriter(output_path, WEATHER_SCHEMA, compression="zstd") as writer:
+        for rows in iter_all_weather_data():
+            batch = pa.RecordBatch.from_pylist(
+                [dict(zip(columns, row)) for row in rows], schema=WEATHER_SCHEMA
+            )
+            writer.write_batch(batch)
+            total_rows += len(rows)
+
+    print(f"Found {total_rows} rows")
+    print(f"Data dumped to {output_path}")
 
 
 @app.command()
@@ -113,16 +180,21 @@ def station():
                 coords=(details.latitude, details.longitude),
                 altitude=details.altitude,
             )
-            print(f"Fetched and stored data for station {station_id}")
             return details
-        except Exception as e:
-            print(f"Error fetching data for station {station_id}: {e}")
+        except Exception:
+            logging.exception(f"Error fetching data for station {station_id}")
             return None
 
     with ThreadPoolExecutor(max_workers=10) as executor:
-        station_details = list(
-            filter(None, executor.map(fetch_station_details, station_list))
-        )
+        futures = [
+            executor.submit(fetch_station_details, station) for station in station_list
+        ]
+
+        with typer.progressbar(
+            as_completed(futures), length=len(futures), label="Fetching station data"
+        ) as progress:
+            for future in progress:
+                future.result()
 
 
 @app.command()
@@ -133,24 +205,32 @@ def station_dump():
     # Define column names based on the SQLite schema
     columns = ["station_id", "name", "latitude", "longitude", "altitude", "_updated_at"]
 
-    # Create DataFrame with column names
-    df = pd.DataFrame(get_all_station_details(), columns=columns)
+    # Create DataFrame with column names; from_records skips the generic
+    # ndarray-inference path taken by the plain DataFrame constructor
+    df = pd.DataFrame.from_records(get_all_station_details(), columns=columns)
     print(f"Found {len(df)} stations")
 
     today = datetime.now().strftime("%Y-%m-%d")
     os.makedirs("output/station_dump", exist_ok=True)
 
-    # Save to parquet
-    df.to_parquet(f"output/station_dump/{today}.parquet")
-    print(f"Station data dumped to output/station_dump/{today}.parquet")
-
-    # Save to JSON
-    df.to_json(f"output/station_dump/{today}.json", orient="records", indent=2)
-    print(f"Station data dumped to output/station_dump/{today}.json")
+    # The three writers touch disjoint files and none of them modify df,
+    # so run them concurrently to overlap encoding and disk I/O
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(df.to_parquet, f"output/station_dump/{today}.parquet"),
+            executor.submit(
+                df.to_json,
+                f"output/station_dump/{today}.json",
+                orient="records",
+                indent=2,
+            ),
+            executor.submit(df.to_csv, f"output/station_dump/{today}.csv", index=False),
+        ]
+        for future in futures:
+            future.result()
 
-    # Save to CSV
-    df.to_csv(f"output/station_dump/{today}.csv", index=False)
-    print(f"Station data dumped to output/station_dump/{today}.csv")
+    for ext in ("parquet", "json", "csv"):
+        print(f"Station data dumped to output/station_dump/{today}.{ext}")
 
 
 if __name__ == "__main__":
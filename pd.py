@@ -8,6 +8,11 @@ def read_parquet_file():
         # file_name = "output/dump/2025-01-13.parquet"
         #
         df = pd.read_parquet(file_name)
+
+        # Parse date column with an explicit format to skip inference
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", cache=True)
+
         # Display basic information about the dataframe
         print("\nDataframe Info:")
         print(df.info())
@@ -1,6 +1,8 @@
 import os
 import psycopg2
+from psycopg2.extras import execute_values
 from contextlib import contextmanager
+from operator import itemgetter
 from typing import Optional, Union
 from pydantic import BaseModel
 
@@ -64,40 +66,60 @@ def create_weather_table():
                 print("Weather data table already exists.")
 
 
-def insert_weather_data(weather_data: Union[BaseModel, list[BaseModel]]):
-    """Insert weather data into PostgreSQL database."""
+# Insert SQL and column order, computed once per (model class, upsert) pair
+_insert_sql_cache: dict[tuple[type, bool], tuple[list[str], str]] = {}
+
+
+def _weather_insert_sql(
+    model_cls: type[BaseModel], upsert: bool
+) -> tuple[list[str], str]:
+    """Return the (columns, SQL) pair for inserting a model into weather_data."""
+    key = (model_cls, upsert)
+    if key not in _insert_sql_cache:
+        columns = list(model_cls.model_fields)
+        if upsert:
+            conflict_clause = "DO UPDATE SET " + ", ".join(
+                f"{col} = EXCLUDED.{col}" for col in columns
+            )
+        else:
+            conflict_clause = "DO NOTHING"
+        sql = f"""
+            INSERT INTO weather_data ({", ".join(columns)})
+            VALUES %s
+            ON CONFLICT (date, time, station_id)
+            {conflict_clause}
+        """
+        _insert_sql_cache[key] = (columns, sql)
+    return _insert_sql_cache[key]
+
+
+def insert_weather_data(
+    weather_data: Union[BaseModel, list[BaseModel]], upsert: bool = False
+):
+    """Insert weather data into PostgreSQL database.
+
+    By default existing (date, time, station_id) rows are left untouched,
+    so re-runs over covered dates cost a single index probe per row.
+    Pass upsert=True to rewrite existing rows instead.
+    """
+    # Handle single record or batch
+    if not isinstance(weather_data, list):
+        weather_data = [weather_data]
+
+    if not weather_data:
+        return
+
+    columns, sql = _weather_insert_sql(type(weather_data[0]), upsert)
+
+    # Dump each record once; itemgetter pulls all columns in one C call.
+    # A generator keeps only one page of dumped rows alive at a time
+    getter = itemgetter(*columns)
+    values = (getter(record.model_dump()) for record in weather_data)
+
     with get_db_connection() as conn:
         with conn.cursor() as cur:
-            # Handle single record or batch
-            if not isinstance(weather_data, list):
-                weather_data = [weather_data]
-
-            if not weather_data:
-                return
-
-            # Get column names from first record
-            data_dict = weather_data[0].model_dump()
-            columns = list(data_dict.keys())
-
-            # Prepare values for all records
-            values = [
-                [record.model_dump()[col] for col in columns] for record in weather_data
-            ]
-
-            # Create placeholders for the SQL query
-            placeholders = ",".join(["%s"] * len(columns))
-
-            # Construct the SQL query with ON CONFLICT clause
-            sql = f"""
-                INSERT INTO weather_data ({", ".join(columns)}) 
-                VALUES ({placeholders})
-                ON CONFLICT (date, time, station_id) 
-                DO UPDATE SET 
-                    {", ".join(f"{col} = EXCLUDED.{col}" for col in columns)}
-            """
-
-            # Execute many inserts at once
-            cur.executemany(sql, values)
+            # Send all rows in a single multi-VALUES statement
+            execute_values(cur, sql, values, page_size=1000)
 
         conn.commit()
 
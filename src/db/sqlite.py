@@ -1,23 +1,115 @@
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
-from typing import Optional, Union
+from itertools import chain
+from operator import itemgetter
+from typing import Iterable, Optional, Union
 from pydantic import BaseModel
 
+_init_lock = threading.Lock()
+_initialized = False
+
+# Column order of the weather_data and station_details tables; used so
+# queries project explicit columns instead of SELECT *
+WEATHER_COLUMNS = (
+    "date",
+    "time",
+    "station_id",
+    "station_name",
+    "temp_max",
+    "temp_min",
+    "temp_med",
+    "wind_dir",
+    "wind_speed",
+    "wind_gust",
+    "pressure",
+    "precipitation",
+    "total_cloud",
+    "low_cloud",
+    "sun_duration",
+    "visibility",
+    "humidity",
+    "dew_point",
+    "weather_summary",
+    "snow_depth",
+    "_updated_at",
+)
+
+STATION_COLUMNS = (
+    "station_id",
+    "name",
+    "latitude",
+    "longitude",
+    "altitude",
+    "_updated_at",
+)
+
+_tls = threading.local()
+
+# Version counter bumped by the insert paths; read-side caches keyed on
+# it stay valid until the next write lands
+_read_cache_lock = threading.Lock()
+_data_version = 0
+_existing_dates_cache: Optional[tuple[int, list[str]]] = None
+_station_list_cache: Optional[tuple[int, list[tuple[str, str]]]] = None
+
+
+def _bump_data_version():
+    """Invalidate the read-side caches after a write."""
+    global _data_version
+    with _read_cache_lock:
+        _data_version += 1
+
 
 @contextmanager
 def get_db_connection():
-    """Create a database connection context manager."""
-    db_path = os.getenv("DATABASE_PATH", "weather_data.db")
-    # Create the directory if it doesn't exist
-    os.makedirs(
-        os.path.dirname(db_path) if os.path.dirname(db_path) else ".", exist_ok=True
-    )
-    conn = sqlite3.connect(db_path)
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """Yield the calling thread's database connection.
+
+    Each worker thread lazily opens one connection on first use and
+    keeps it for the process lifetime, instead of paying connection
+    setup (and losing SQLite's page cache) on every call.
+    """
+    if not hasattr(_tls, "conn"):
+        db_path = os.getenv("DATABASE_PATH", "weather_data.db")
+        # isolation_level=None leaves transaction control to the SQL
+        # layer, so batch writers can drive BEGIN/COMMIT explicitly
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        # Tuned once per connection: WAL lets readers run concurrently
+        # with the writer, NORMAL halves the fsyncs per commit, and the
+        # mmap/cache sizes keep hot pages out of the syscall path
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-200000")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _tls.conn = conn
+    yield _tls.conn
+
+
+@contextmanager
+def get_ro_db_connection():
+    """Yield the calling thread's read-only database connection.
+
+    Read-only connections can never take the write lock and skip
+    journal setup, so the get_* paths run in parallel with the ingest
+    writer instead of queueing behind it. Falls back to the read/write
+    connection when the database file doesn't exist yet.
+    """
+    if not hasattr(_tls, "ro_conn"):
+        db_path = os.getenv("DATABASE_PATH", "weather_data.db")
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        except sqlite3.OperationalError:
+            with get_db_connection() as rw_conn:
+                yield rw_conn
+            return
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-200000")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _tls.ro_conn = conn
+    yield _tls.ro_conn
 
 
 def create_weather_table():
@@ -50,6 +142,20 @@ def create_weather_table():
                 PRIMARY KEY (date, time, station_id)
             )
         """)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_weather_date ON weather_data(date)"
+        )
+        # Station-only filters in get_weather_data can't use the
+        # (date, time, station_id) primary key prefix
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_weather_station_date"
+            " ON weather_data(station_id, date)"
+        )
+        # Station lookups read the incrementally-maintained
+        # station_details table, and the one-time backfill in
+        # create_station_table can afford a plain scan, so no
+        # (station_id, station_name) index is kept on weather_data
+        cur.execute("DROP INDEX IF EXISTS ix_weather_station_name")
         conn.commit()
         print("Weather data table created successfully.")
 
@@ -68,59 +174,174 @@ def create_station_table():
                 _updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        # Backfill stations from databases created before inserts started
+        # maintaining station_details incrementally. Only an empty
+        # station_details needs it, so the unindexed DISTINCT scan of
+        # weather_data runs once per database, not on every invocation
+        cur.execute("SELECT EXISTS (SELECT 1 FROM station_details)")
+        if not cur.fetchone()[0]:
+            cur.execute("""
+                INSERT OR IGNORE INTO station_details (station_id, name)
+                SELECT DISTINCT station_id, station_name FROM weather_data
+            """)
         conn.commit()
         print("Station details table created successfully.")
 
 
-def insert_weather_data(weather_data: Union[BaseModel, list[BaseModel]]):
-    """Insert weather data into SQLite database."""
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        # Handle single record or batch
-        if not isinstance(weather_data, list):
-            weather_data = [weather_data]
-
-        if not weather_data:
-            return
-
-        # Get column names from first record
-        data_dict = weather_data[0].model_dump()
-        columns = list(data_dict.keys())
+# Insert SQL and column order, computed once per (model class, upsert) pair
+_insert_sql_cache: dict[tuple[type, bool], tuple[list[str], str]] = {}
 
-        # Prepare values for all records
-        values = [
-            [record.model_dump()[col] for col in columns] for record in weather_data
-        ]
 
-        # Create placeholders for the SQL query
+def _weather_insert_sql(
+    model_cls: type[BaseModel], upsert: bool
+) -> tuple[list[str], str]:
+    """Return the (columns, SQL) pair for inserting a model into weather_data."""
+    key = (model_cls, upsert)
+    if key not in _insert_sql_cache:
+        columns = list(model_cls.model_fields)
         placeholders = ",".join(["?" for _ in columns])
-
-        # Construct the SQL query with ON CONFLICT clause
+        if upsert:
+            # DO UPDATE rewrites the conflicting row in place, unlike
+            # INSERT OR REPLACE which deletes and re-inserts it
+            primary_key = ("date", "time", "station_id")
+            # _updated_at isn't a model field, so refresh it explicitly;
+            # OR REPLACE used to get this for free by re-inserting the row
+            conflict_clause = "DO UPDATE SET " + ", ".join(
+                [f"{col}=excluded.{col}" for col in columns if col not in primary_key]
+                + ["_updated_at=CURRENT_TIMESTAMP"]
+            )
+        else:
+            conflict_clause = "DO NOTHING"
         sql = f"""
-            INSERT OR REPLACE INTO weather_data ({", ".join(columns)}) 
+            INSERT INTO weather_data ({", ".join(columns)})
             VALUES ({placeholders})
+            ON CONFLICT (date, time, station_id) {conflict_clause}
         """
+        _insert_sql_cache[key] = (columns, sql)
+    return _insert_sql_cache[key]
 
-        # Execute many inserts at once
-        cur.executemany(sql, values)
-        conn.commit()
+
+def insert_weather_data(
+    weather_data: Union[BaseModel, list[BaseModel]], upsert: bool = False
+):
+    """Insert a batch of weather data into SQLite in a single transaction.
+
+    By default existing (date, time, station_id) rows are left untouched,
+    so re-runs over covered dates cost a single index probe per row.
+    Pass upsert=True to rewrite existing rows instead.
+    """
+    # Handle single record or batch
+    if not isinstance(weather_data, list):
+        weather_data = [weather_data]
+
+    if not weather_data:
+        return
+
+    columns, sql = _weather_insert_sql(type(weather_data[0]), upsert)
+
+    # Dump each record once; itemgetter pulls all columns in one C call.
+    # A generator keeps only one dumped row alive at a time
+    getter = itemgetter(*columns)
+    values = (getter(record.model_dump()) for record in weather_data)
+
+    # Maintain the distinct station set incrementally so station lookups
+    # never need a DISTINCT scan over weather_data
+    stations = {
+        (record.station_id, record.station_name) for record in weather_data
+    }
+
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        # One explicit transaction for the whole batch: a single fsync
+        # instead of one per row, and the write lock is taken up front
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany(sql, values)
+            cur.executemany(
+                "INSERT OR IGNORE INTO station_details (station_id, name)"
+                " VALUES (?, ?)",
+                stations,
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    _bump_data_version()
+
+
+# Station ids already present in station_details, loaded lazily and kept
+# in sync by insert_station_details so repeated missing-station checks
+# don't re-run the SQL anti-join
+_station_cache_lock = threading.Lock()
+_station_cache: Optional[set[str]] = None
+
+
+def _known_station_ids() -> set[str]:
+    """Return the cached set of station ids that already have details."""
+    global _station_cache
+    with _station_cache_lock:
+        if _station_cache is None:
+            with get_ro_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT station_id FROM station_details"
+                    " WHERE latitude IS NOT NULL"
+                )
+                _station_cache = {row[0] for row in cur.fetchall()}
+        return set(_station_cache)
+
+
+def insert_station_details_many(
+    stations: Iterable[tuple[str, str, tuple[float, float], float]],
+):
+    """Insert or update many station details in a single transaction.
+
+    Args:
+        stations: Iterable of (station_id, name, (latitude, longitude),
+            altitude) tuples
+    """
+    rows = [
+        (station_id, name, coords[0], coords[1], altitude)
+        for station_id, name, coords, altitude in stations
+    ]
+    if not rows:
+        return
+
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany(
+                """
+                INSERT INTO station_details
+                (station_id, name, latitude, longitude, altitude)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (station_id) DO UPDATE SET
+                    name=excluded.name,
+                    latitude=excluded.latitude,
+                    longitude=excluded.longitude,
+                    altitude=excluded.altitude,
+                    _updated_at=CURRENT_TIMESTAMP
+            """,
+                rows,
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    _bump_data_version()
+    with _station_cache_lock:
+        if _station_cache is not None:
+            _station_cache.update(row[0] for row in rows)
 
 
 def insert_station_details(
     station_id: str, name: str, coords: tuple[float, float], altitude: float
 ):
     """Insert or update station details in the database."""
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT OR REPLACE INTO station_details 
-            (station_id, name, latitude, longitude, altitude)
-            VALUES (?, ?, ?, ?, ?)
-        """,
-            (station_id, name, coords[0], coords[1], altitude),
-        )
-        conn.commit()
+    insert_station_details_many([(station_id, name, coords, altitude)])
 
 
 def get_weather_data(
@@ -142,83 +363,139 @@ def get_weather_data(
     conditions = []
     params = []
 
-    if from_date and to_date is None:
-        conditions.append("date = ?")
-        params.append(from_date)
-
-    if from_date and to_date:
-        conditions.append("date >= ? AND date <= ?")
-        params.append(from_date)
-        params.append(to_date)
+    if from_date:
+        # BETWEEN keeps the planner on the (date, ...) index seek for
+        # both the single-date and range cases
+        conditions.append("date BETWEEN ? AND ?")
+        params.extend([from_date, to_date or from_date])
 
     if station_id:
         conditions.append("station_id = ?")
         params.append(station_id)
 
-    where_clause = " AND ".join(conditions) if conditions else "1"
+    where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
 
-    with get_db_connection() as conn:
+    query = (
+        f"SELECT {', '.join(WEATHER_COLUMNS)} FROM weather_data"
+        f"{where_clause} ORDER BY date, time"
+    )
+    return [row for chunk in _iter_query(query, params) for row in chunk]
+
+
+def _iter_query(query: str, params: list = (), chunk_size: int = 65536):
+    """Execute a query and yield its rows in fixed-size chunks.
+
+    Keeps memory bounded on large result sets: only one chunk of rows
+    is resident at a time instead of the whole result.
+    """
+    with get_ro_db_connection() as conn:
         cur = conn.cursor()
-        query = f"SELECT * FROM weather_data WHERE {where_clause} ORDER BY date, time"
         cur.execute(query, params)
-        return cur.fetchall()
+        while rows := cur.fetchmany(chunk_size):
+            yield rows
 
 
 def get_all_weather_data() -> list[tuple]:
     """Get all weather data from the database."""
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM weather_data")
-        return cur.fetchall()
+    return [row for chunk in iter_all_weather_data() for row in chunk]
+
+
+def iter_all_weather_data(chunk_size: int = 65536):
+    """Yield all weather data rows in fixed-size chunks."""
+    yield from _iter_query(
+        f"SELECT {', '.join(WEATHER_COLUMNS)} FROM weather_data",
+        chunk_size=chunk_size,
+    )
 
 
 def get_existing_dates() -> list[str]:
-    """Get list of distinct dates in the database."""
-    with get_db_connection() as conn:
+    """Get list of distinct dates in the database.
+
+    Memoized until the next insert bumps the data version.
+    """
+    global _existing_dates_cache
+    with _read_cache_lock:
+        version = _data_version
+        if _existing_dates_cache is not None and _existing_dates_cache[0] == version:
+            return list(_existing_dates_cache[1])
+
+    with get_ro_db_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT DISTINCT date FROM weather_data")
-        return [date[0] for date in cur.fetchall()]
+        # GROUP BY walks the date index; chain flattens the one-column
+        # rows without a per-row tuple unpack in Python
+        cur.execute("SELECT date FROM weather_data GROUP BY date")
+        dates = list(chain.from_iterable(cur))
+
+    with _read_cache_lock:
+        _existing_dates_cache = (version, dates)
+    return list(dates)
 
 
 def get_station_list() -> list[tuple[str, str]]:
     """Get list of distinct stations in the database.
 
+    Reads the incrementally-maintained station_details table instead of
+    a DISTINCT scan over weather_data; memoized until the next insert
+    bumps the data version.
+
     Returns:
         List of tuples containing (station_id, station_name)
     """
-    with get_db_connection() as conn:
+    global _station_list_cache
+    with _read_cache_lock:
+        version = _data_version
+        if _station_list_cache is not None and _station_list_cache[0] == version:
+            return list(_station_list_cache[1])
+
+    with get_ro_db_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT DISTINCT station_id, station_name FROM weather_data")
-        return cur.fetchall()
+        cur.execute("SELECT station_id, name FROM station_details")
+        stations = cur.fetchall()
+
+    with _read_cache_lock:
+        _station_list_cache = (version, stations)
+    return list(stations)
 
 
 def get_missing_stations() -> list[tuple[str, str]]:
-    """Get list of stations that exist in weather_data but not in stations table.
+    """Get list of stations that don't have their details fetched yet.
 
     Returns:
         List of tuples containing (station_id, station_name) that need to be added
     """
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        # Get stations that are in weather_data but not in station_details table
-        cur.execute("""
-            SELECT DISTINCT w.station_id, w.station_name 
-            FROM weather_data w
-            LEFT JOIN station_details s ON w.station_id = s.station_id
-            WHERE s.station_id IS NULL
-        """)
-        return cur.fetchall()
+    # Filter against the cached detailed-station set instead of
+    # re-scanning station_details on every call
+    known = _known_station_ids()
+    return [
+        (station_id, station_name)
+        for station_id, station_name in get_station_list()
+        if station_id not in known
+    ]
 
 
 def init_database():
-    """Initialize the database and create tables if they don't exist."""
-    create_weather_table()
-    create_station_table()
+    """Initialize the database and create tables if they don't exist.
+
+    Runs only once per process; repeated calls (e.g. from parallel
+    workers) are no-ops so the insert path never re-opens a connection
+    just to re-issue CREATE TABLE statements.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        # Create the database directory once at startup rather than on
+        # every connection open
+        db_path = os.getenv("DATABASE_PATH", "weather_data.db")
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        create_weather_table()
+        create_station_table()
+        _initialized = True
 
 
 def get_all_station_details() -> list[tuple]:
     """Get all station details from the database."""
-    with get_db_connection() as conn:
+    with get_ro_db_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM station_details")
+        cur.execute(f"SELECT {', '.join(STATION_COLUMNS)} FROM station_details")
         return cur.fetchall()
@@ -1,21 +1,73 @@
 import datetime
+import functools
 import logging
 import os
 import urllib.request
-import warnings
 from typing import Optional, Union
 from typing import Optional as OptionalType
-import time
 import pandas as pd
-from bs4 import BeautifulSoup
-from pydantic import BaseModel, Field
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import typer
 import re
 
 from src.db.sqlite import insert_weather_data, get_weather_data, get_existing_dates
 
-warnings.simplefilter(action="ignore", category=FutureWarning)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    # OGIMET pages compress 5-10x; requests decompresses transparently
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "Cookie": "ogimet_serverid=huracan|Z4N5U|Z4N3p",
+    "Cache-Control": "no-cache",
+}
+
+# Shared session: keep-alive connections amortize the TCP/TLS handshake
+# across the whole scrape, and Retry replaces the manual timeout retries
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=1, status_forcelist=[502, 503, 504]),
+    ),
+)
+
+
+# Station-page patterns, compiled once at import
+_ID_NAME_RE = re.compile(r"(\d+):.*?([^()]+)")
+_COORDS_RE = re.compile(r"Latitude: (.*?) .*?Longitude: (.*?) ")
+_ALT_RE = re.compile(r"Altitude: (\d+)")
+
+# Strips cardinal letters and turns hyphen separators into spaces in one
+# C-level pass over a coordinate string
+_DIR_TABLE = str.maketrans({"N": None, "S": None, "E": None, "W": None, "-": " "})
+
+# Pulls the "id - name" payload out of the overlib CAPTION call in a
+# station cell's onmouseover attribute
+_CAPTION_RE = re.compile(r"CAPTION,\s*'([^']+)'", re.DOTALL)
+
+
+# Both parse paths only ever look inside tables, so skip building tree
+# nodes for the rest of the document
+_TABLE_STRAINER = SoupStrainer("table")
+
+
+def _make_soup(html_content: str) -> BeautifulSoup:
+    """Build a soup with the C-backed lxml parser, falling back to html.parser."""
+    try:
+        return BeautifulSoup(html_content, "lxml", parse_only=_TABLE_STRAINER)
+    except FeatureNotFound:
+        return BeautifulSoup(html_content, "html.parser", parse_only=_TABLE_STRAINER)
 
 
 def fetch_ogimet_data(
@@ -44,29 +96,23 @@ def fetch_ogimet_data(
 
     logging.info(f"Fetching data from URL: {url}")
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Connection": "keep-alive",
-        "Cookie": "ogimet_serverid=huracan|Z4N5U|Z4N3p",
-        "Cache-Control": "no-cache",
-    }
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _SESSION.get(url, timeout=10)
         response.raise_for_status()
-    except requests.exceptions.Timeout:
-        print("Request timed out - retrying once...")
-        time.sleep(2)
-        response = requests.get(url, headers=headers, timeout=10)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
         raise
     return query_date, query_time, response.text
 
 
+@functools.lru_cache(maxsize=4096)
 def fetch_station_data(station_id: str) -> str:
     """Fetch station data from OGIMET website.
 
+    Station metadata is immutable for our purposes, so responses are
+    memoized per station id; the station_details table already provides
+    the cross-run cache.
+
     Args:
         station_id: The station ID to fetch data for
 
@@ -75,21 +121,9 @@ def fetch_station_data(station_id: str) -> str:
     """
     url = f"https://www.ogimet.com/cgi-bin/gsynres?lang=en&ind={station_id}"
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Connection": "keep-alive",
-        "Cookie": "ogimet_serverid=huracan|Z4N5U|Z4N3p",
-        "Cache-Control": "no-cache",
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _SESSION.get(url, timeout=10)
         response.raise_for_status()
-    except requests.exceptions.Timeout:
-        print("Request timed out - retrying once...")
-        time.sleep(2)
-        response = requests.get(url, headers=headers, timeout=10)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching station data: {e}")
         raise
@@ -100,6 +134,10 @@ def fetch_station_data(station_id: str) -> str:
 class StationData(BaseModel):
     """Model for weather station details."""
 
+    # Rows are read-only once parsed; frozen models skip the
+    # validate-on-assignment machinery entirely
+    model_config = ConfigDict(frozen=True)
+
     station_id: str = Field(description="Weather station identifier")
     name: str = Field(description="Weather station name")
     latitude: float = Field(description="Station latitude in decimal degrees")
@@ -116,10 +154,10 @@ def parse_station_data(html_content: str) -> StationData:
     Returns:
         StationData object containing station details
     """
-    soup = BeautifulSoup(html_content, "html.parser")
+    soup = _make_soup(html_content)
 
     # Find the station info table
-    table = soup.find("table", attrs={"border": "2", "align": "center"})
+    table = soup.select_one('table[border="2"][align="center"]')
     if not table:
         raise ValueError("Could not find station info table")
 
@@ -127,32 +165,21 @@ def parse_station_data(html_content: str) -> StationData:
     station_text = table.get_text()
 
     # Parse station ID and name
-    id_name = re.search(r"(\d+):.*?([^()]+)", station_text)
+    id_name = _ID_NAME_RE.search(station_text)
     if not id_name:
         raise ValueError("Could not parse station ID and name")
     station_id = id_name.group(1)
     station_name = id_name.group(2).strip()
 
     # Parse coordinates
-    coords = re.search(r"Latitude: (.*?) .*?Longitude: (.*?) ", station_text)
+    coords = _COORDS_RE.search(station_text)
     if not coords:
         raise ValueError("Could not parse coordinates")
 
     def convert_to_decimal(coord_str: str) -> float:
-        # Store original string to check direction later
-        orig_coord = coord_str
-
-        # Remove cardinal directions and clean up string
-        coord_str = (
-            coord_str.replace("N", "")
-            .replace("S", "")
-            .replace("E", "")
-            .replace("W", "")
-            .strip()
-        )
-
-        # Split into components, handling both space and hyphen separators
-        parts = coord_str.replace("-", " ").split()
+        # One translate pass drops the cardinal letters and normalizes
+        # both space and hyphen separators; split() handles the strip
+        parts = coord_str.translate(_DIR_TABLE).split()
 
         # Handle cases with only degrees and minutes
         if len(parts) == 2:
@@ -165,7 +192,7 @@ def parse_station_data(html_content: str) -> StationData:
         decimal = degrees + minutes / 60 + seconds / 3600
 
         # Make negative if South or West
-        if "S" in orig_coord or "W" in orig_coord:
+        if "S" in coord_str or "W" in coord_str:
             decimal = -decimal
 
         return decimal
@@ -174,7 +201,7 @@ def parse_station_data(html_content: str) -> StationData:
     longitude = convert_to_decimal(coords.group(2))
 
     # Parse altitude
-    alt = re.search(r"Altitude: (\d+)", station_text)
+    alt = _ALT_RE.search(station_text)
     if not alt:
         raise ValueError("Could not parse altitude")
     altitude = float(alt.group(1))
@@ -199,6 +226,8 @@ def parse_station_data(html_content: str) -> StationData:
 
 
 class WeatherData(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     date: str = Field(
         description="Date of the weather observation in YYYY-MM-DD format"
     )
@@ -225,25 +254,51 @@ class WeatherData(BaseModel):
     snow_depth: OptionalType[int] = Field(None, description="Snow depth")
 
 
+# Validating the whole batch at once is substantially cheaper in
+# pydantic v2 than constructing the models row by row
+_WEATHER_LIST_ADAPTER = TypeAdapter(list[WeatherData])
+
+
+# Fields parsed as numbers; everything else mapped from the table is
+# kept as text (after empty-sentinel normalization)
+_NUMERIC_FIELDS = frozenset(
+    {
+        "temp_max",
+        "temp_min",
+        "temp_med",
+        "humidity",
+        "dew_point",
+        "wind_speed",
+        "wind_gust",
+        "pressure",
+        "precipitation",
+        "total_cloud",
+        "low_cloud",
+        "sun_duration",
+        "visibility",
+        "snow_depth",
+    }
+)
+
+
 def parse_ogimet_data(
     query_date: str,
     query_time: str,
     html_content: str,
 ) -> list[WeatherData]:
     """Parse the HTML content from the OGIMET website and return list of WeatherData objects."""
-    soup = BeautifulSoup(html_content, "html.parser")
+    # Cheap reject: error and maintenance pages never contain the data
+    # table, so a substring miss skips building the tree at all
+    if 'bgcolor="#d0d0d0"' not in html_content:
+        print("No weather data table found in HTML content")
+        return []
+
+    soup = _make_soup(html_content)
     weather_data_batch = []
 
-    # Find the main weather data table
-    table = soup.find(
-        "table",
-        attrs={
-            "align": "center",
-            "border": "0",
-            "cellspacing": "1",
-            "bgcolor": "#d0d0d0",
-        },
-    )
+    # Find the main weather data table; the compiled selector is cached
+    # by soupsieve, and bgcolor alone narrows candidates fastest
+    table = soup.select_one('table[bgcolor="#d0d0d0"][cellspacing="1"][border="0"]')
 
     if table is None:
         print("No weather data table found in HTML content")
@@ -272,34 +327,42 @@ def parse_ogimet_data(
     #     "weather_summary": 11,
     # }
 
+    # Resolve (field, column index, parser) once so the per-row work is a
+    # tight loop instead of a membership test and dict lookup per field.
+    # "station" is handled separately below; "weather_summary" has never
+    # been extracted, and the row-length check depends on that
+    plan = [
+        (name, idx, parse_numeric if name in _NUMERIC_FIELDS else null_if_empty)
+        for name, idx in column_map.items()
+        if name != "station" and name != "weather_summary"
+    ]
+
     # Process each row in the table
     for row in table.find_all("tr")[2:]:  # Skip header rows
         cells = row.find_all("td")
         if len(cells) < len(column_map):
             continue
 
-        # Get station info from first column
-        station_cell = cells[0].find("a")
-        if station_cell and station_cell.get("onmouseover"):
-            mouseover = station_cell.get("onmouseover")
-            if "CAPTION," in mouseover:
-                station = null_if_empty(
-                    mouseover.split("CAPTION,")[1].split("'")[1].strip()
-                )
-            else:
-                station = null_if_empty(station_cell.text.strip())
-        else:
-            station = null_if_empty(cells[0].text.strip())
+        # Extract every cell's text once; the repeated .text.strip()
+        # navigations were the dominant per-row soup overhead
+        cell_texts = [cell.get_text(strip=True) for cell in cells]
+
+        # Get station info from the first column: one regex over the
+        # cell markup replaces the find("a") walk and the string splits
+        caption = _CAPTION_RE.search(cells[0].decode_contents())
+        station = null_if_empty(caption.group(1).strip() if caption else cell_texts[0])
 
         if station == "Summary" or not station:
             continue
 
-        try:
-            station_id = station.split("-")[0].strip()
-            station_name = station.split("-")[1].strip()
-        except IndexError:
+        # One scan instead of two full splits; names containing hyphens
+        # keep everything after the first separator
+        station_id, sep, station_name = station.partition("-")
+        if not sep:
             print(f"Invalid station format: {station}")
             continue
+        station_id = station_id.strip()
+        station_name = station_name.strip()
 
         # Extract weather data using column positions
         row_data = {
@@ -309,74 +372,9 @@ def parse_ogimet_data(
             "station_name": station_name,
         }
 
-        # Get temperature values
-        if "temp_max" in column_map:
-            row_data["temp_max"] = parse_numeric(
-                cells[column_map["temp_max"]].text.strip()
-            )
-        if "temp_min" in column_map:
-            row_data["temp_min"] = parse_numeric(
-                cells[column_map["temp_min"]].text.strip()
-            )
-        if "temp_med" in column_map:
-            row_data["temp_med"] = parse_numeric(
-                cells[column_map["temp_med"]].text.strip()
-            )
-
-        # Get humidity and dew point
-        if "humidity" in column_map:
-            row_data["humidity"] = parse_numeric(
-                cells[column_map["humidity"]].text.strip()
-            )
-        if "dew_point" in column_map:
-            row_data["dew_point"] = parse_numeric(
-                cells[column_map["dew_point"]].text.strip()
-            )
-
-        # Get wind values
-        if "wind_dir" in column_map:
-            row_data["wind_dir"] = null_if_empty(
-                cells[column_map["wind_dir"]].text.strip()
-            )
-        if "wind_speed" in column_map:
-            row_data["wind_speed"] = parse_numeric(
-                cells[column_map["wind_speed"]].text.strip()
-            )
-        if "wind_gust" in column_map:
-            row_data["wind_gust"] = parse_numeric(
-                cells[column_map["wind_gust"]].text.strip()
-            )
-
-        # Get other measurements
-        if "pressure" in column_map:
-            row_data["pressure"] = parse_numeric(
-                cells[column_map["pressure"]].text.strip()
-            )
-        if "precipitation" in column_map:
-            row_data["precipitation"] = parse_numeric(
-                cells[column_map["precipitation"]].text.strip()
-            )
-        if "total_cloud" in column_map:
-            row_data["total_cloud"] = parse_numeric(
-                cells[column_map["total_cloud"]].text.strip()
-            )
-        if "low_cloud" in column_map:
-            row_data["low_cloud"] = parse_numeric(
-                cells[column_map["low_cloud"]].text.strip()
-            )
-        if "sun_duration" in column_map:
-            row_data["sun_duration"] = parse_numeric(
-                cells[column_map["sun_duration"]].text.strip()
-            )
-        if "visibility" in column_map:
-            row_data["visibility"] = parse_numeric(
-                cells[column_map["visibility"]].text.strip()
-            )
-
-        if "snow_depth" in column_map:
-            row_data["snow_depth"] = parse_numeric(
-                cells[column_map["snow_depth"]].text.strip()
-            )
+        # Extract every mapped measurement through the precomputed plan
+        for name, idx, parser in plan:
+            row_data[name] = parser(cell_texts[idx])
 
         len_row_data = len(row_data) - 2  # Remove date and time
         len_column_map = len(column_map)
@@ -388,22 +386,31 @@ def parse_ogimet_data(
             )
             break
 
-        try:
-            # print(row_data)
-            # print("\n\n")
-            weather_data = WeatherData(**row_data)
-            weather_data_batch.append(weather_data)
-        except Exception as e:
-            print(f"Error creating weather data for station {station_id}: {e}")
-            continue
+        weather_data_batch.append(row_data)
 
-    return weather_data_batch
+    try:
+        return _WEATHER_LIST_ADAPTER.validate_python(weather_data_batch)
+    except Exception:
+        # Fall back to per-row construction so one malformed row doesn't
+        # drop the whole batch
+        validated = []
+        for row_data in weather_data_batch:
+            try:
+                validated.append(WeatherData(**row_data))
+            except Exception as e:
+                print(
+                    f"Error creating weather data for station "
+                    f"{row_data.get('station_id')}: {e}"
+                )
+                continue
+        return validated
 
 
 def parse_numeric(value: str) -> Optional[float]:
     """Convert string to number, return None if invalid."""
-    value = null_if_empty(value)
-    if value is None:
+    # Sentinel check inlined; this runs once per numeric cell and the
+    # extra null_if_empty frame showed up in profiles
+    if value in _EMPTY_VALUES:
         return None
     try:
         return float(value)
@@ -519,23 +526,39 @@ def get_column_mapping(header_rows):
     return column_map
 
 
-def fetch_and_parse_data(date: Optional[datetime.datetime] = None) -> None:
+def fetch_and_parse_rows(
+    date: Optional[datetime.datetime] = None,
+) -> list[WeatherData]:
     """
-    Fetch and parse weather data from OGIMET website, then store in database.
+    Fetch and parse weather data from OGIMET website and return the rows.
 
     Args:
         date: Optional datetime object. If not provided, current date will be used.
+
+    Returns:
+        List of parsed WeatherData rows (empty if the page had no data)
     """
+    query_date, query_time, html_content = fetch_ogimet_data(date)
 
-    # print(f"Fetching weather data for {date}")
+    weather_data_batch = parse_ogimet_data(query_date, query_time, html_content)
 
-    # Fetch the data
-    query_date, query_time, html_content = fetch_ogimet_data(date)
+    if not weather_data_batch:
+        typer.secho(
+            f"No weather data found for {query_date} {query_time}",
+            fg=typer.colors.YELLOW,
+        )
 
-    # print(f"Fetched data for {query_date} {query_time}")
+    return weather_data_batch
 
-    # Parse the data
-    weather_data_batch = parse_ogimet_data(query_date, query_time, html_content)
+
+def fetch_and_parse_data(date: Optional[datetime.datetime] = None) -> None:
+    """
+    Fetch and parse weather data from OGIMET website, then store in database.
+
+    Args:
+        date: Optional datetime object. If not provided, current date will be used.
+    """
+    weather_data_batch = fetch_and_parse_rows(date)
 
     # Insert the data
     if weather_data_batch:
@@ -543,19 +566,16 @@ def fetch_and_parse_data(date: Optional[datetime.datetime] = None) -> None:
             insert_weather_data(weather_data_batch)
         except Exception as e:
             typer.secho(f"Error inserting batch weather data: {e}", fg=typer.colors.RED)
-    else:
-        typer.secho(
-            f"No weather data found for {query_date} {query_time}",
-            fg=typer.colors.YELLOW,
-        )
+
+
+# Placeholder cell values OGIMET uses for missing data; hashed lookup
+# keeps the hottest helper in the parse loop O(1)
+_EMPTY_VALUES: frozenset[str] = frozenset({"", "-----", "----", "---"})
 
 
 def null_if_empty(value: str) -> Optional[str]:
     """Convert empty or dash-only strings to None, otherwise return the original value."""
-    empty_values = ["", "-----", "----", "---"]
-    if value in empty_values:
-        return None
-    return value
+    return None if value in _EMPTY_VALUES else value
 
 
 def create_date_range(
@@ -573,53 +593,62 @@ def create_date_range(
     Raises:
         ValueError: If dates are invalid or end date is before start date
     """
+    # fromisoformat is a C fast path; strptime re-interprets the format
+    # string on every call
     try:
-        start_date = datetime.datetime.strptime(from_date, "%Y-%m-%d")
+        start_date = datetime.datetime.fromisoformat(from_date)
     except ValueError:
         raise ValueError(f"Invalid start date format: {from_date}. Use YYYY-MM-DD")
 
     if to_date:
         try:
-            end_date = datetime.datetime.strptime(to_date, "%Y-%m-%d")
+            end_date = datetime.datetime.fromisoformat(to_date)
         except ValueError:
             raise ValueError(f"Invalid end date format: {to_date}. Use YYYY-MM-DD")
 
         if end_date < start_date:
             raise ValueError("End date cannot be before start date")
 
-        date_range = [
-            start_date + datetime.timedelta(days=x)
-            for x in range((end_date - start_date).days + 1)
-        ]
         print(f"Fetching weather data from {from_date} to {to_date}")
     else:
-        date_range = [start_date]
+        end_date = start_date
         print(f"Fetching weather data for {from_date}")
 
-    return date_range
+    return list(pd.date_range(start_date, end_date, freq="D").to_pydatetime())
 
 
 def get_missing_dates(from_date: str, to_date: str) -> list[datetime.datetime]:
     date_range = create_date_range(from_date=from_date, to_date=to_date)
-    existing_dates = get_existing_dates()
-    return [
-        date for date in date_range if date.strftime("%Y-%m-%d") not in existing_dates
-    ]
+    # One strftime per date and a single set difference; get_existing_dates
+    # is already memoized against the data version in the sqlite layer
+    wanted = {date.strftime("%Y-%m-%d"): date for date in date_range}
+    missing = wanted.keys() - frozenset(get_existing_dates())
+    return [date for key, date in wanted.items() if key in missing]
 
 
 def save_output(df: pd.DataFrame):
-    df = df.sort_values("date")
+    # Explicit format + cache avoids per-row dateutil inference
+    df = df.sort_values(
+        "date",
+        key=lambda s: pd.to_datetime(s, format="%Y-%m-%d", cache=True),
+        kind="stable",
+        ignore_index=True,
+    )
     from_date = df.iloc[0]["date"]
     to_date = df.iloc[-1]["date"]
 
     folder = f"output/{from_date}_{to_date}"
     os.makedirs(folder, exist_ok=True)
 
+    # pandas' JSON writer is already a C encoder, so it stays as-is
     df.to_json(f"{folder}/data.json", orient="records")
     print(f"Data saved to {folder}/data.json")
 
-    df.to_parquet(f"{folder}/data.parquet")
+    # Build the Arrow table directly so the meaningless RangeIndex never
+    # gets encoded into the file
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        f"{folder}/data.parquet",
+        compression="zstd",
+    )
     print(f"Data saved to {folder}/data.parquet")
-
-    # df.to_excel(f"{folder}/data.xlsx", index=False)
-    # print("Data saved to output/data.xlsx")